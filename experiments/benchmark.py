@@ -2,6 +2,14 @@ from timeit import timeit
 from numba import njit
 import numpy as np
 
+@njit
+def div_pow2(x, k):
+    # Dividing a signed integer by a power of 2 needs extra instructions to
+    # get rounding right for negative numbers.  Casting to unsigned first
+    # means the division is just a single shift instruction, regardless of
+    # the original signedness.
+    return np.uint32(x) >> k
+
 @njit
 def divide(n):
     total = 0
@@ -26,9 +34,21 @@ def divide2(n):
         total += i // 32
     return total
 
+@njit
+def divide_unsigned(n):
+    total = 0
+    for i in range(n):
+        total += div_pow2(i, 5)
+    return total
+
 assert divide(1000) == shift(1000)
 assert divide(1000) == divide2(1000)
+assert divide(1000) == divide_unsigned(1000)
+# For negative inputs, div_pow2() should act like unsigned 32-bit division:
+for x in range(-1000, 1000):
+    assert div_pow2(x, 5) == (x & 0xFFFFFFFF) >> 5
 
 print("divide", timeit(lambda: divide(10_000)))
 print("shift", timeit(lambda: shift(10_000)))
 print("divide2", timeit(lambda: divide2(10_000)))
+print("divide_unsigned", timeit(lambda: divide_unsigned(10_000)))
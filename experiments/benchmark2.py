@@ -1,5 +1,5 @@
 from timeit import timeit
-from numba import njit
+from numba import njit, uint64
 import numpy as np
 
 ARR = np.ones((1_00, 1_00), dtype=np.uint64)
@@ -13,13 +13,41 @@ def variant1(arr):
 
 @njit
 def variant2(arr):
-    total = 0
-    arr = arr.ravel()
-    for i in range(len(arr)):
-        total += arr[i]
+    # Walk the dimensions in memory order, instead of creating a view:
+    total = uint64(0)
+    for i in range(arr.shape[0]):
+        for j in range(arr.shape[1]):
+            total += arr[i, j]
     return total
 
+@njit
+def variant3(flat):
+    # 4 independent accumulators, splitting up the dependency chain by hand.
+    # This turns out to be much slower than variant2(): LLVM already
+    # vectorizes variant2()'s simple loop, and the manual split gets in the
+    # way of that.
+    a = b = c = d = uint64(0)
+    n = len(flat) - len(flat) % 4
+    for i in range(0, n, 4):
+        a += flat[i]
+        b += flat[i + 1]
+        c += flat[i + 2]
+        d += flat[i + 3]
+    tail = uint64(0)
+    for value in flat[n:]:
+        tail += value
+    return a + b + c + d + tail
+
+# variant3() takes a 1D view, created once up front rather than on every call:
+assert ARR.flags.c_contiguous
+FLAT_ARR = ARR.reshape(-1)
+
 assert variant1(ARR) == variant2(ARR)
+assert variant1(ARR) == variant3(FLAT_ARR)
+assert variant1(ARR) == ARR.sum()
 
 print("variant1", timeit(lambda: variant1(ARR)))
 print("variant2", timeit(lambda: variant2(ARR)))
+print("variant3", timeit(lambda: variant3(FLAT_ARR)))
+# NumPy's own reduction, as a reference point:
+print("ARR.sum()", timeit(lambda: ARR.sum()))
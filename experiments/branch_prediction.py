@@ -11,67 +11,151 @@ import numpy as np
 
 # Increases linearly from 1 to 1,000,000:
 PREDICTABLE_DATA = np.linspace(1, 1_000_000, 1_000_000, dtype=np.uint64)
-# Shuffled randomly:
-RANDOM_DATA = PREDICTABLE_DATA.copy()
-np.random.shuffle(RANDOM_DATA)
+# Shuffled randomly, with a fixed seed so runs are comparable:
+RNG = np.random.default_rng(0)
+RANDOM_DATA = RNG.permutation(PREDICTABLE_DATA)
 
 from numba import float64, int64, uint32, uint64
 
 @njit
 def count_increasing_decreasing(arr):
+    n = len(arr)
     previous = 0
     increasing = uint32(0)
     unchanged = uint32(0)
     #assert len(arr) < 2 ** 31
-    for i in range(len(arr)):
+    for i in range(n):
         value = arr[i]
         if value == previous:
             unchanged += 1
         elif value > previous:
             increasing += 1
         previous = value
-    decreasing = uint32(len(arr) - increasing - unchanged)
+    decreasing = uint32(n - increasing - unchanged)
     return increasing, unchanged, decreasing
 
 print(count_increasing_decreasing([1, 2, 3, 2, 2, 4]))
 
+from numba import types
+from numba.extending import intrinsic
+from llvmlite import ir
+
+def _make_expect(expected):
+    """Create an intrinsic telling LLVM a boolean is usually ``expected``."""
+    @intrinsic
+    def expect(typingctx, cond):
+        def codegen(context, builder, signature, args):
+            i1 = ir.IntType(1)
+            fn = builder.module.declare_intrinsic(
+                "llvm.expect", [i1], fnty=ir.FunctionType(i1, [i1, i1])
+            )
+            return builder.call(fn, [args[0], ir.Constant(i1, expected)])
+        return types.boolean(types.boolean), codegen
+    return expect
+
+likely = _make_expect(1)
+unlikely = _make_expect(0)
+
+@njit
+def count_increasing_decreasing_likely(arr):
+    n = len(arr)
+    previous = 0
+    increasing = uint32(0)
+    unchanged = uint32(0)
+    for i in range(n):
+        value = arr[i]
+        # Same logic as count_increasing_decreasing(), but with the hot path
+        # first and hints so the compiler lays out the code to favor it:
+        if likely(value > previous):
+            increasing += 1
+        elif unlikely(value == previous):
+            unchanged += 1
+        previous = value
+    decreasing = uint32(n - increasing - unchanged)
+    return increasing, unchanged, decreasing
+
+print(count_increasing_decreasing_likely([1, 2, 3, 2, 2, 4]))
+
 @njit
 def count_increasing_decreasing_avoid_conditionals(arr):
+    n = len(arr)
     previous = 0
     increasing = 0
     unchanged = 0
-    for i in range(len(arr)):
+    for i in range(n):
         value = arr[i]
         unchanged += 1 if value == previous else 0
         increasing += 1 if value > previous else 0
         previous = value
-    decreasing = len(arr) - increasing - unchanged
+    decreasing = n - increasing - unchanged
     return increasing, unchanged, decreasing
 
 print(count_increasing_decreasing_avoid_conditionals([1, 2, 3, 2, 2, 4]))
 
 from numba import uint64
 
-@njit
+@njit(locals={"packed": uint64})
 def count_increasing_decreasing_avoid_conditionals_2(arr):
+    # Both counters are packed into a single uint64: unchanged in the low 32
+    # bits, increasing in the high 32 bits.  So long as there are fewer than
+    # 2 ** 32 values the low half can't overflow into the high half.
+    n = len(arr)
+    assert n < 2 ** 32
     previous = 0
-    increasing = 0
-    unchanged = 0
+    packed = uint64(0)
     for value in arr:
-        unchanged += uint64(value == previous)
-        increasing += uint64(value > previous)
+        packed += uint64(value == previous) + (
+            uint64(value > previous) << uint64(32)
+        )
         previous = value
-    decreasing = len(arr) - increasing - unchanged
+    unchanged = packed & uint64(0xFFFFFFFF)
+    increasing = packed >> uint64(32)
+    decreasing = n - increasing - unchanged
     return increasing, unchanged, decreasing
 
 print(count_increasing_decreasing_avoid_conditionals_2([1, 2, 3, 2, 2, 4]))
 
+from numba import prange, get_num_threads
+
+@njit(parallel=True)
+def count_increasing_decreasing_parallel(arr):
+    # Each thread counts its own chunk; the only dependency between chunks is
+    # the previous value, which is just the last element of the prior chunk.
+    n = len(arr)
+    num_chunks = get_num_threads()
+    chunk_size = (n + num_chunks - 1) // num_chunks
+    increasing = np.zeros((num_chunks,), dtype=np.uint64)
+    unchanged = np.zeros((num_chunks,), dtype=np.uint64)
+    for t in prange(num_chunks):
+        start = t * chunk_size
+        end = min(start + chunk_size, n)
+        previous = arr[start - 1] if 0 < start < end else arr.dtype.type(0)
+        local_increasing = uint64(0)
+        local_unchanged = uint64(0)
+        for i in range(start, end):
+            value = arr[i]
+            local_unchanged += uint64(value == previous)
+            local_increasing += uint64(value > previous)
+            previous = value
+        increasing[t] = local_increasing
+        unchanged[t] = local_unchanged
+    total_increasing = increasing.sum()
+    total_unchanged = unchanged.sum()
+    decreasing = n - total_increasing - total_unchanged
+    return total_increasing, total_unchanged, decreasing
+
+print(count_increasing_decreasing_parallel(np.array([1, 2, 3, 2, 2, 4], dtype=np.uint64)))
+
 if __name__ == '__main__':
     import sys
     if sys.argv[1] == "original":
         f = count_increasing_decreasing
+    elif sys.argv[1] == "likely":
+        f = count_increasing_decreasing_likely
     elif sys.argv[1] == "branchless":
         f = count_increasing_decreasing_avoid_conditionals
+    elif sys.argv[1] == "parallel":
+        f = count_increasing_decreasing_parallel
     else:
         assert sys.argv[1] == "branchless2"
         f = count_increasing_decreasing_avoid_conditionals_2
@@ -0,0 +1,35 @@
+import os
+os.environ["NUMBA_LOOP_VECTORIZE"] = "0"
+
+from numba import njit, uint64
+import numpy as np
+
+MULTIPLIER = np.uint64(437799614237992725)
+# 2 ** 61 - 1 is a Mersenne prime, so reducing modulo it doesn't need a
+# division: x % (2 ** 61 - 1) == (x & MASK) + (x >> 61), plus one final
+# conditional subtraction.
+MASK = np.uint64(2 ** 61 - 1)
+
+@njit
+def generate_random_numbers_mersenne(n):
+    result = np.empty((n,), dtype=np.uint64)
+    for i in range(n):
+        random_number = uint64(i) * MULTIPLIER
+        random_number = (random_number & MASK) + (random_number >> uint64(61))
+        random_number -= MASK * uint64(random_number >= MASK)
+        result[i] = random_number
+    return result
+
+def generate_random_numbers_numpy(n):
+    result = np.arange(n, dtype=np.uint64) * MULTIPLIER
+    result = (result & MASK) + (result >> np.uint64(61))
+    result -= MASK * (result >= MASK)
+    return result
+
+# Both should match a plain % on the same wrapped-around uint64 product:
+EXPECTED = (np.arange(1_000_000, dtype=np.uint64) * MULTIPLIER) % MASK
+assert np.array_equal(generate_random_numbers_mersenne(1_000_000), EXPECTED)
+assert np.array_equal(generate_random_numbers_numpy(1_000_000), EXPECTED)
+
+for i in range(5000):
+    generate_random_numbers_mersenne(1_000_000)
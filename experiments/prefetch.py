@@ -0,0 +1,108 @@
+from timeit import timeit
+from numba import njit, types
+from numba.core import cgutils
+from numba.extending import intrinsic
+from llvmlite import ir
+import numpy as np
+
+LINEAR = 1
+RANDOM = 22695477
+
+# How many hops ahead of the current index to prefetch:
+PREFETCH_DISTANCE = 8
+
+
+@intrinsic
+def prefetch(typingctx, arr, index):
+    """Hint to the CPU that arr[index] will be written to soon."""
+    def codegen(context, builder, signature, args):
+        arr_type, _ = signature.args
+        array = context.make_array(arr_type)(context, builder, args[0])
+        ptr = cgutils.get_item_pointer(context, builder, arr_type, array, [args[1]])
+        i8_ptr = ir.IntType(8).as_pointer()
+        i32 = ir.IntType(32)
+        fn = cgutils.get_or_insert_function(
+            builder.module,
+            ir.FunctionType(ir.VoidType(), [i8_ptr, i32, i32, i32]),
+            "llvm.prefetch.p0i8",
+        )
+        # Arguments are: address, write (1) vs read (0), locality (3 is
+        # "keep in all cache levels"), and data (1) vs instruction (0) cache.
+        builder.call(fn, [builder.bitcast(ptr, i8_ptr), i32(1), i32(3), i32(1)])
+        return context.get_dummy_value()
+
+    return types.void(arr, index), codegen
+
+
+@njit
+def scan_memory(array_size, multiplier):
+    data = np.ones((array_size,), dtype=np.uint8)
+
+    index = 0
+    for _ in range(10_000_000):
+        data[index] += 1
+        index = (multiplier * index + 1) % array_size
+    return data[0]
+
+
+@njit
+def scan_memory_prefetch(array_size, multiplier):
+    data = np.ones((array_size,), dtype=np.uint8)
+
+    index = 0
+    if multiplier == LINEAR:
+        # The hardware prefetcher handles linear scans just fine:
+        for _ in range(10_000_000):
+            data[index] += 1
+            index = (index + 1) % array_size
+        return data[0]
+
+    # The next index depends only on the current one, so we can compute where
+    # we'll be a few hops from now and start loading it early:
+    ahead = index
+    for _ in range(PREFETCH_DISTANCE):
+        ahead = (multiplier * ahead + 1) % array_size
+    for _ in range(10_000_000):
+        prefetch(data, ahead)
+        data[index] += 1
+        index = (multiplier * index + 1) % array_size
+        ahead = (multiplier * ahead + 1) % array_size
+    return data[0]
+
+
+@njit
+def scan_memory_mask(array_size, multiplier):
+    # With a power-of-two size, % can be replaced by a single & instruction,
+    # taking a division off the critical path between loads:
+    assert array_size & (array_size - 1) == 0
+    mask = array_size - 1
+    data = np.ones((array_size,), dtype=np.uint8)
+
+    index = 0
+    for _ in range(10_000_000):
+        data[index] += 1
+        index = (multiplier * index + 1) & mask
+    return data[0]
+
+
+# 128MiB, still much bigger than the CPU caches:
+POW2_SIZE = 1 << 27
+
+for multiplier in (LINEAR, RANDOM):
+    assert scan_memory(POW2_SIZE, multiplier) == scan_memory_mask(
+        POW2_SIZE, multiplier
+    )
+
+for multiplier in (LINEAR, RANDOM):
+    assert scan_memory(100_000_000, multiplier) == scan_memory_prefetch(
+        100_000_000, multiplier
+    )
+
+print("linear", timeit(lambda: scan_memory(100_000_000, LINEAR), number=10))
+print("random", timeit(lambda: scan_memory(100_000_000, RANDOM), number=10))
+print(
+    "random, prefetch",
+    timeit(lambda: scan_memory_prefetch(100_000_000, RANDOM), number=10),
+)
+print("linear, mask", timeit(lambda: scan_memory_mask(POW2_SIZE, LINEAR), number=10))
+print("random, mask", timeit(lambda: scan_memory_mask(POW2_SIZE, RANDOM), number=10))
@@ -2,11 +2,14 @@ from numba import njit, uint64
 import numpy as np
 import timeit
 
+# How many times to run each function when timing it:
+REPEATS = 1000
+
 # Increases linearly from 1 to 1,000,000:
 PREDICTABLE_DATA = np.linspace(1, 1_000_000, 1_000_000, dtype=np.uint64)
-# Shuffled randomly:
-RANDOM_DATA = PREDICTABLE_DATA.copy()
-np.random.shuffle(RANDOM_DATA)
+# Shuffled randomly, with a fixed seed so runs are comparable:
+RNG = np.random.default_rng(0)
+RANDOM_DATA = RNG.permutation(PREDICTABLE_DATA)
 
 #import llvmlite.binding as llvm
 #llvm.set_option('', '--debug-only=loop-vectorize')
@@ -21,7 +24,7 @@ def naive_max(arr):
     return result
 
 naive_max(RANDOM_DATA)
-print("naive", timeit.timeit("naive_max(RANDOM_DATA)", globals=globals(), number=1000))
+print("naive", timeit.timeit(lambda: naive_max(RANDOM_DATA), number=REPEATS))
 
 @njit
 def branchless(arr):
@@ -33,24 +36,49 @@ def branchless(arr):
     return result
 
 branchless(RANDOM_DATA)
-print("branchless", timeit.timeit("branchless(RANDOM_DATA)", globals=globals(), number=1000))
+print("branchless", timeit.timeit(lambda: branchless(RANDOM_DATA), number=REPEATS))
+
+@njit
+def fast_max(arr):
+    # 8 independent accumulators, i.e. doing by hand what LLVM already does
+    # for naive_max() and branchless(): both compile to SIMD vpmaxuq.  So
+    # this doesn't help; in practice it's no faster than branchless().
+    dt = arr.dtype.type
+    r0 = r1 = r2 = r3 = r4 = r5 = r6 = r7 = dt(0)
+    n = len(arr)
+    end = n - n % 8
+    for i in range(0, end, 8):
+        r0 = max(r0, arr[i])
+        r1 = max(r1, arr[i + 1])
+        r2 = max(r2, arr[i + 2])
+        r3 = max(r3, arr[i + 3])
+        r4 = max(r4, arr[i + 4])
+        r5 = max(r5, arr[i + 5])
+        r6 = max(r6, arr[i + 6])
+        r7 = max(r7, arr[i + 7])
+    # Handle the tail of the array:
+    for i in range(end, n):
+        r0 = max(r0, arr[i])
+    return max(max(max(r0, r1), max(r2, r3)), max(max(r4, r5), max(r6, r7)))
+
+assert fast_max(RANDOM_DATA) == naive_max(RANDOM_DATA)
+assert fast_max(RANDOM_DATA[:13]) == naive_max(RANDOM_DATA[:13])
+print("fast_max", timeit.timeit(lambda: fast_max(RANDOM_DATA), number=REPEATS))
 raise SystemExit()
 
 @njit
 def unrolled(arr):
-    results = np.zeros((4,), dtype=arr.dtype)
+    # Local variables rather than an array, so the accumulators can stay in
+    # registers instead of being loaded and stored on every iteration:
+    r0 = r1 = r2 = r3 = arr.dtype.type(0)
     for i in range(len(arr) // 4):
-        results[0] = arr[i * 4] if arr[i * 4] > results[0] else results[0]
-        results[1] = arr[i * 4 + 1] if arr[i * 4 + 1] > results[1] else results[1]
-        results[2] = arr[i * 4 + 2] if arr[i * 4 + 2] > results[2] else results[2]
-        results[3] = arr[i * 4 + 3] if arr[i * 4 + 3] > results[3] else results[3]
-
-    result = arr.dtype.type(0)
+        r0 = arr[i * 4] if arr[i * 4] > r0 else r0
+        r1 = arr[i * 4 + 1] if arr[i * 4 + 1] > r1 else r1
+        r2 = arr[i * 4 + 2] if arr[i * 4 + 2] > r2 else r2
+        r3 = arr[i * 4 + 3] if arr[i * 4 + 3] > r3 else r3
 
     # Combine the 4 values:
-    for value in results:
-        if value > result:
-            result = value
+    result = max(max(r0, r1), max(r2, r3))
     # Handle the tail of the array:
     for value in arr[-4:]:
         if value > result:
@@ -58,7 +86,7 @@ def unrolled(arr):
     return result
 
 print(unrolled(RANDOM_DATA))
-print("unrolled", timeit.timeit("unrolled(RANDOM_DATA)", globals=globals(), number=1000))
+print("unrolled", timeit.timeit(lambda: unrolled(RANDOM_DATA), number=REPEATS))
 
 @njit
 def unrolled2(arr):
@@ -82,4 +110,4 @@ def unrolled2(arr):
     return result
 
 print(unrolled2(RANDOM_DATA))
-print("unrolled2", timeit.timeit("unrolled2(RANDOM_DATA)", globals=globals(), number=1000))
+print("unrolled2", timeit.timeit(lambda: unrolled2(RANDOM_DATA), number=REPEATS))
@@ -2,26 +2,32 @@ from numba import njit, uint64
 import numpy as np
 import timeit
 
+# How many times to run each function when timing it:
+REPEATS = 1000
+
 # Increases linearly from 1 to 1,000,000:
 PREDICTABLE_DATA = np.linspace(1, 1_000_000, 1_000_000, dtype=np.uint64)
-# Shuffled randomly:
-RANDOM_DATA = PREDICTABLE_DATA.copy()
-np.random.shuffle(RANDOM_DATA)
-RANDOM_DATA2 = np.random.randint(0, 1_000_000, (1_000_000,), dtype=np.uint64)
+# Shuffled randomly, with a fixed seed so runs are comparable:
+RNG = np.random.default_rng(0)
+RANDOM_DATA = RNG.permutation(PREDICTABLE_DATA)
+RANDOM_DATA2 = RNG.integers(0, 1_000_000, (1_000_000,), dtype=np.uint64)
 
 #import llvmlite.binding as llvm
 #llvm.set_option('', '--debug-only=loop-vectorize')
 
 
-@njit(error_model="numpy")
+@njit(error_model="numpy", fastmath=True)
 def mean(x, y):
     out = np.empty(x.shape, dtype=np.float64)
     for i in range(x.shape[0]):
-        out[i] = x.dtype.type(2) * (x[i] - y[i]) / (x[i] + y[i])
+        # Convert to floats up front, so the loop is pure float64 math:
+        a = np.float64(x[i])
+        b = np.float64(y[i])
+        out[i] = 2.0 * (a - b) / (a + b)
     return out
 
 mean(RANDOM_DATA, RANDOM_DATA2)
-print("mean", timeit.timeit("mean(RANDOM_DATA, RANDOM_DATA2)", globals=globals(), number=1000))
+print("mean", timeit.timeit(lambda: mean(RANDOM_DATA, RANDOM_DATA2), number=REPEATS))
 
 @njit
 def mean2(arr1, arr2):
@@ -31,11 +37,18 @@ def mean2(arr1, arr2):
         i = uint64(i)
         for j in range(4):
             j = uint64(j)
-            result[i * 4 + j] = (arr1[i * 4 +j] + arr2[i * 4 + j]) / 2
+            a = np.float64(arr1[i * 4 + j])
+            b = np.float64(arr2[i * 4 + j])
+            result[i * 4 + j] = 2.0 * (a - b) / (a + b)
     return result
 
-mean2(RANDOM_DATA, RANDOM_DATA2)
-print("mean2", timeit.timeit("mean2(RANDOM_DATA, RANDOM_DATA2)", globals=globals(), number=1000))
+# Both variants should compute the same thing:
+assert np.allclose(
+    mean(RANDOM_DATA[:1000], RANDOM_DATA2[:1000]),
+    mean2(RANDOM_DATA[:1000], RANDOM_DATA2[:1000]),
+    equal_nan=True,
+)
+print("mean2", timeit.timeit(lambda: mean2(RANDOM_DATA, RANDOM_DATA2), number=REPEATS))
 raise SystemExit()
 
 @njit
@@ -47,25 +60,23 @@ def branchless(arr):
     return result
 
 branchless(RANDOM_DATA)
-print("branchless", timeit.timeit("branchless(RANDOM_DATA)", globals=globals(), number=1000))
+print("branchless", timeit.timeit(lambda: branchless(RANDOM_DATA), number=REPEATS))
 raise SystemExit(0)
 
 @njit
 def unrolled(arr):
-    results = np.zeros((4,), dtype=np.uint64)
+    # Local variables rather than an array, so the accumulators can stay in
+    # registers instead of being loaded and stored on every iteration:
+    r0 = r1 = r2 = r3 = uint64(0)
     for i in range(len(arr) // uint64(4)):
         i = uint64(i)
-        results[0] = arr[i * 4] if arr[i * 4] > results[0] else results[0]
-        results[1] = arr[i * 4 + 1] if arr[i * 4 + 1] > results[1] else results[1]
-        results[2] = arr[i * 4 + 2] if arr[i * 4 + 2] > results[2] else results[2]
-        results[3] = arr[i * 4 + 3] if arr[i * 4 + 3] > results[3] else results[3]
-
-    result = uint64(0)
+        r0 = arr[i * 4] if arr[i * 4] > r0 else r0
+        r1 = arr[i * 4 + 1] if arr[i * 4 + 1] > r1 else r1
+        r2 = arr[i * 4 + 2] if arr[i * 4 + 2] > r2 else r2
+        r3 = arr[i * 4 + 3] if arr[i * 4 + 3] > r3 else r3
 
     # Combine the 4 values:
-    for value in results:
-        if value > result:
-            result = value
+    result = max(max(r0, r1), max(r2, r3))
     # Handle the tail of the array:
     for value in arr[-4:]:
         if value > result:
@@ -73,7 +84,7 @@ def unrolled(arr):
     return result
 
 print(unrolled(RANDOM_DATA))
-print("unrolled", timeit.timeit("unrolled(RANDOM_DATA)", globals=globals(), number=1000))
+print("unrolled", timeit.timeit(lambda: unrolled(RANDOM_DATA), number=REPEATS))
 #raise SystemExit(1)
 
 @njit
@@ -99,4 +110,4 @@ def unrolled2(arr):
     return result
 
 print(unrolled2(RANDOM_DATA))
-print("unrolled2", timeit.timeit("unrolled2(RANDOM_DATA)", globals=globals(), number=1000))
+print("unrolled2", timeit.timeit(lambda: unrolled2(RANDOM_DATA), number=REPEATS))
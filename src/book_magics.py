@@ -1,6 +1,10 @@
-from timeit import timeit
+from timeit import Timer
+from time import perf_counter, process_time
 from io import BytesIO
-import locale
+from contextlib import contextmanager
+import gc
+import os
+import re
 
 from IPython.core.magic import (
     register_cell_magic,
@@ -9,25 +13,85 @@ from IPython.core.magic import (
 )
 from IPython.core.magic_arguments import argument, magic_arguments, parse_argstring
 from IPython.display import display, Markdown, Image
-from pytablewriter import MarkdownTableWriter
-from pytablewriter.style import Style
 import numpy as np
 import PIL.Image
 from py_perf_event import measure, Hardware
 
-locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
-
-
-def ns_per_iteration(line, globals):
-    elapsed_secs = timeit(line, globals=globals, number=1_00)
-    return int((elapsed_secs * 1_000_000_000) / 1_000)
+# Matches non-blank, non-comment lines, without surrounding whitespace:
+LINE_RE = re.compile(r"(?m)^[ \t]*([^\s#].*?)[ \t]*$")
+
+
+@contextmanager
+def pinned_to_one_cpu():
+    """
+    Pin the current thread to a single CPU core, so it doesn't get migrated
+    between cores (and lose its warm caches) in the middle of a benchmark.
+
+    The core can be chosen with the ``BENCH_CPU`` environment variable.  By
+    default it's the highest-numbered allowed core, since CPU 0 usually
+    handles most interrupts.
+
+    Threads started while pinned inherit the single-core affinity and keep it
+    after this returns, e.g. Numba's worker pool for ``parallel=True``, so
+    start them before pinning.
+    """
+    original = os.sched_getaffinity(0)
+    cpu = int(os.environ.get("BENCH_CPU", max(original)))
+    os.sched_setaffinity(0, {cpu})
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, original)
+
+
+def get_clock():
+    """
+    Return the clock to time benchmarks with.
+
+    Setting ``BENCH_TIMER=cpu`` uses process CPU time instead of wall-clock
+    time, which excludes time the process spent preempted on a busy machine.
+    """
+    if os.environ.get("BENCH_TIMER", "wall") == "cpu":
+        return process_time
+    return perf_counter
+
+
+def ns_per_iteration(line, globals, events=()):
+    """
+    Return the nanoseconds per run of the line, and the average count per run
+    for each of the given perf events.
+    """
+    # Timer compiles the line once, directly into its timing loop, so there's
+    # no per-iteration exec() or function call overhead:
+    timer = Timer(line, globals=globals, timer=get_clock())
+    # Warm up first, so JIT compilation, page faults and cold caches don't
+    # skew the choice of iteration count, and get any pending garbage
+    # collection out of the way.  This happens before pinning, so any thread
+    # pools the code starts aren't stuck on a single core:
+    timer.timeit(number=3)
+    gc.collect()
+    with pinned_to_one_cpu():
+        # Pick a number of iterations that takes a reasonable amount of time,
+        # then take the best of multiple repeats to reduce noise:
+        number, _ = timer.autorange()
+        times = timer.repeat(repeat=4 if events else 5, number=number)
+        event_counts = []
+        if events:
+            # Count events during the last repeat, rather than running the
+            # line yet again just to measure it:
+            event_counts = measure(
+                events, lambda: times.append(timer.timeit(number=number))
+            )
+    # Keep the fractional nanoseconds; rounding happens when displaying:
+    elapsed_ns = (min(times) * 1_000_000_000) / number
+    return elapsed_ns, [count / number for count in event_counts]
 
 
 MEASUREMENTS = {
     "instructions": (
         "CPU instructions",
         [Hardware.INSTRUCTIONS],
-        lambda instructions: instructions,
+        lambda instructions: round(instructions),
     ),
     "memory_cache_miss": (
         "Memory cache miss %",
@@ -37,7 +101,7 @@ MEASUREMENTS = {
     "memory_cache_refs": (
         "Memory cache references",
         [Hardware.CACHE_REFERENCES],
-        lambda refs: refs,
+        lambda refs: round(refs),
     ),
     "branch_mispredictions": (
         "Branch misprediction %",
@@ -47,11 +111,83 @@ MEASUREMENTS = {
     "branches": (
         "Branch instructions",
         [Hardware.BRANCH_INSTRUCTIONS],
-        lambda ints: ints,
+        lambda ints: round(ints),
     ),
 }
 
 
+def get_events(measurements):
+    """Return all the perf events needed by the given measurements."""
+    # Dedupe the events, so each one is only counted once:
+    event_list = []
+    for m in measurements:
+        for event in MEASUREMENTS[m][1]:
+            if not any(event is e for e in event_list):
+                event_list.append(event)
+    return event_list
+
+
+def get_measurements(measurements, event_list, event_counts):
+    """
+    Return the post-processed value for each measurement, given the counts
+    for the events returned by ``get_events()``.
+    """
+    # Map by identity, so we don't depend on how events hash:
+    counts_by_id = {
+        id(event): count for (event, count) in zip(event_list, event_counts)
+    }
+
+    result = []
+    for m in measurements:
+        _, events, post_process = MEASUREMENTS[m]
+        result.append(post_process(*[counts_by_id[id(e)] for e in events]))
+    return result
+
+
+def format_value(value):
+    """Format a table cell, with thousands separators for numbers."""
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    # A literal | would otherwise end the table cell:
+    return str(value).replace("|", "\\|")
+
+
+def format_markdown_table(headers, rows):
+    """
+    Format a Markdown table, right-aligning numeric columns.
+
+    Cells are formatted and column widths computed in a single pass over the
+    rows.
+    """
+    widths = [len(header) for header in headers]
+    numeric = [True] * len(headers)
+    formatted_rows = []
+    for row in rows:
+        formatted = []
+        for i, value in enumerate(row):
+            text = format_value(value)
+            widths[i] = max(widths[i], len(text))
+            numeric[i] = numeric[i] and isinstance(value, (int, float))
+            formatted.append(text)
+        formatted_rows.append(formatted)
+
+    def format_row(cells):
+        return "| " + " | ".join(
+            cell.rjust(width) if is_numeric else cell.ljust(width)
+            for (cell, width, is_numeric) in zip(cells, widths, numeric)
+        ) + " |"
+
+    separator = "|" + "|".join(
+        "-" * (width + 1) + ":" if is_numeric else ":" + "-" * (width + 1)
+        for (width, is_numeric) in zip(widths, numeric)
+    ) + "|"
+    lines = [format_row(headers), separator]
+    lines.extend(format_row(cells) for cells in formatted_rows)
+    return "\n".join(lines)
+
+
 @magic_arguments()
 @argument("--measure", default="")
 @needs_local_scope
@@ -59,18 +195,13 @@ MEASUREMENTS = {
 def compare_timing(line, cell, local_ns):
     arguments = parse_argstring(compare_timing, line)
     measurements = [m for m in arguments.measure.split(",") if m]
+    event_list = get_events(measurements)
 
     result = []
-    for line in cell.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        result.append([f"`{line}`", ns_per_iteration(line, local_ns)])
-        if measurements:
-            for m in measurements:
-                _, events, post_process = MEASUREMENTS[m]
-                results = measure(events, exec, line, local_ns)
-                result[-1].append(post_process(*results))
+    for line in LINE_RE.findall(cell):
+        elapsed_ns, event_counts = ns_per_iteration(line, local_ns, event_list)
+        result.append([f"`{line}`", elapsed_ns])
+        result[-1].extend(get_measurements(measurements, event_list, event_counts))
 
     minimum_value = min(r[1] for r in result)
     for (units, factor) in [
@@ -82,17 +213,18 @@ def compare_timing(line, cell, local_ns):
             break
     for row in result:
         row[1] /= factor
-        # Round to whole numbers:
-        row[1] = int(round(row[1]))
+        if factor == 1:
+            # Nanosecond timings can be in single digits, so keep a decimal:
+            row[1] = round(row[1], 1)
+        else:
+            # Otherwise there are at least 10 units, so whole numbers suffice:
+            row[1] = int(round(row[1]))
 
     headers = ["Code", f"Elapsed {units}"]
     for m in measurements:
         headers.append(MEASUREMENTS[m][0])
 
-    table = MarkdownTableWriter(headers=headers, value_matrix=result)
-    for i in range(1, len(headers)):
-        table.set_style(i, Style(thousand_separator=","))
-    display(Markdown(table.dumps()))
+    display(Markdown(format_markdown_table(headers, result)))
 
 
 @needs_local_scope
@@ -101,7 +233,8 @@ def display_image(line, local_ns):
     array_name = line.strip()
     array = local_ns[array_name]
     f = BytesIO()
-    PIL.Image.fromarray(array).save(f, "png")
+    # Fast compression; file size doesn't matter much for display:
+    PIL.Image.fromarray(array).save(f, "png", compress_level=1, optimize=False)
     display(Image(data=f.getvalue()))
 
 
@@ -2,6 +2,25 @@ from contextlib import contextmanager
 import sys
 import os
 
+# Modules from a copy of Numba imported with loop vectorization disabled;
+# importing it is slow, so it's only done once and then swapped in as needed:
+_no_simd_modules = None
+
+
+def _is_numba_module(name):
+    return name.startswith("numba") or name.startswith("llvmlite")
+
+
+def _remove_numba_modules():
+    """Remove imported Numba and LLVMLite modules, returning them."""
+    removed = {
+        name: mod for (name, mod) in sys.modules.items() if _is_numba_module(name)
+    }
+    for name in removed:
+        del sys.modules[name]
+    return removed
+
+
 @contextmanager
 def disabled_simd():
     """
@@ -17,17 +36,21 @@ def disabled_simd():
             def this_will_not_use_simd():
                 # ... your Numba code ...
     """
-    def clear_numba():
-        """Remove already imported modules for Numba and LLVMLite."""
-        for mod in list(sys.modules):
-            if mod.startswith("numba") or mod.startswith("llvmlite"):
-                del sys.modules[mod]
-
-    clear_numba()
+    global _no_simd_modules
+    original_modules = _remove_numba_modules()
+    original_env = os.environ.get("NUMBA_LOOP_VECTORIZE")
     os.environ["NUMBA_LOOP_VECTORIZE"] = "0"
     try:
+        if _no_simd_modules is not None:
+            sys.modules.update(_no_simd_modules)
         from numba import njit
         yield njit
     finally:
-        os.environ["NUMBA_LOOP_VECTORIZE"] = "1"
-        clear_numba()
+        if original_env is None:
+            del os.environ["NUMBA_LOOP_VECTORIZE"]
+        else:
+            os.environ["NUMBA_LOOP_VECTORIZE"] = original_env
+        # Keep the no-SIMD Numba around for next time, and put back the
+        # original Numba so other code doesn't have to re-import it:
+        _no_simd_modules = _remove_numba_modules()
+        sys.modules.update(original_modules)